@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from numpy import empty, inf, int64, searchsorted
+
+from hmmadn._typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from hmmadn._typing import ndarray
+
+try:
+    from numba import njit
+except ImportError:
+    # Numba est optionnel : sans lui, les classes utilisent leur
+    # implémentation en NumPy.
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        return lambda func: func
+else:
+    NUMBA_AVAILABLE = True
+
+
+@njit(cache=True, nogil=True)
+def viterbi_core(
+        pred_ptr: ndarray,
+        pred_idx: ndarray,
+        pred_log_a: ndarray,
+        log_b: ndarray,
+        log_mus: ndarray,
+        deltas: ndarray,
+        phis: ndarray,
+    ) -> None:
+    """Remplir les tables de deltas et de phis de Viterbi.
+
+    Seuls les prédécesseurs i avec a_ij > 0 sont parcourus, ce qui est
+    beaucoup moins coûteux qu'un parcours de tous les états quand la
+    matrice de transition est creuse.
+
+    Paramètres
+    ----------
+    pred_ptr, pred_idx, pred_log_a : ndarray
+        Les prédécesseurs de chaque état, voir utils.get_predecessors.
+    log_b : ndarray
+        Les log-vraisemblances des observations, de forme (T, N).
+    log_mus : ndarray
+        Le log des probabilités initiales, de forme (N,).
+    deltas : ndarray
+        La table des deltas à remplir, de forme (T, N).
+    phis : ndarray
+        La table des phis à remplir, de forme (T, N).
+
+    """
+    n_obs, n = log_b.shape
+    for j in range(n):
+        deltas[0, j] = log_mus[j] + log_b[0, j]
+        phis[0, j] = 0
+    for t in range(1, n_obs):
+        for j in range(n):
+            max_val = -inf
+            argmax_i = 0
+            for k in range(pred_ptr[j], pred_ptr[j+1]):
+                i = pred_idx[k]
+                temp = pred_log_a[k] + deltas[t-1, i]
+                if temp > max_val:
+                    max_val = temp
+                    argmax_i = i
+            phis[t, j] = argmax_i
+            deltas[t, j] = max_val + log_b[t, j]
+
+
+@njit(cache=True, nogil=True)
+def semi_viterbi_core(
+        pred_ptr: ndarray,
+        pred_idx: ndarray,
+        pred_log_a: ndarray,
+        log_b_seg: ndarray,
+        log_mus: ndarray,
+        log_pd: ndarray,
+        deltas: ndarray,
+        phis: ndarray,
+    ) -> None:
+    """Remplir les tables de deltas et de phis du semi-Viterbi.
+
+    Paramètres
+    ----------
+    pred_ptr, pred_idx, pred_log_a : ndarray
+        Les prédécesseurs de chaque état, sans l'état lui-même, voir
+        utils.get_predecessors.
+    log_b_seg : ndarray
+        Les log-vraisemblances des segments, de forme (N, T, D_max).
+    log_mus : ndarray
+        Le log des probabilités initiales, de forme (N,).
+    log_pd : ndarray
+        Le log des probabilités des durées 1..D_max.
+    deltas : ndarray
+        La table des deltas à remplir, de forme (T, D_max, N), initialisée
+        à -inf.
+    phis : ndarray
+        La table des phis à remplir, de forme (T, D_max, N, 2), initialisée
+        à -1 pour indiquer l'absence de prédécesseur.
+
+    """
+    n, n_obs, max_d = log_b_seg.shape
+    # best_prev[t, i] = max sur d_ de deltas[t, d_, i], et best_d[t, i] la
+    # durée d_+1 qui l'atteint : la réduction sur d_ est faite une seule
+    # fois par (t, i) au lieu d'être refaite pour chaque (d, j).
+    best_prev = empty((n_obs, n), dtype=deltas.dtype)
+    best_d = empty((n_obs, n), dtype=int64)
+    for t in range(n_obs):
+        # Un segment de durée d > t+1 dépasserait le début de la séquence.
+        for d in range(1, min(t+1, max_d)+1):
+            log_pd_d = log_pd[d-1]
+            if log_pd_d == -inf:
+                continue
+            for j in range(n):
+                log_bs = log_b_seg[j, t, d-1]
+                if log_bs == -inf:
+                    continue
+                if d == t+1:
+                    # Le premier segment de la séquence.
+                    deltas[t, d-1, j] = log_mus[j] + log_pd_d + log_bs
+                    continue
+                max_val = -inf
+                i_star = -1
+                d_star = -1
+                for k in range(pred_ptr[j], pred_ptr[j+1]):
+                    i = pred_idx[k]
+                    temp = (
+                        pred_log_a[k] + log_pd_d + best_prev[t-d, i] + log_bs
+                    )
+                    if temp > max_val:
+                        max_val = temp
+                        i_star = i
+                        d_star = best_d[t-d, i]
+                # Sans prédécesseur, i_star et d_star restent à -1.
+                deltas[t, d-1, j] = max_val
+                phis[t, d-1, j, 0] = i_star
+                phis[t, d-1, j, 1] = d_star
+        for i in range(n):
+            best_prev[t, i] = deltas[t, 0, i]
+            best_d[t, i] = 1
+            for d_ in range(1, max_d):
+                if deltas[t, d_, i] > best_prev[t, i]:
+                    best_prev[t, i] = deltas[t, d_, i]
+                    best_d[t, i] = d_ + 1
+
+
+@njit(cache=True)
+def markov_walk(
+        cum_rows: ndarray,
+        start_idx: int,
+        uniforms: ndarray,
+    ) -> ndarray:
+    """Parcourir une chaîne de Markov à partir des tirages uniformes donnés.
+
+    Paramètres
+    ----------
+    cum_rows : ndarray
+        Les lignes cumulatives de la matrice de transition, de forme (N, N).
+    start_idx : int
+        L'indice de l'état de départ.
+    uniforms : ndarray
+        Les m tirages uniformes sur [0, 1) utilisés pour les transitions.
+
+    Sortie
+    ------
+    ndarray
+        Les m+1 indices des états visités, en commençant par start_idx.
+
+    """
+    m = uniforms.shape[0]
+    idxs = empty(m+1, dtype=int64)
+    idxs[0] = start_idx
+    for k in range(m):
+        idxs[k+1] = searchsorted(cum_rows[idxs[k]], uniforms[k], side='right')
+    return idxs
@@ -0,0 +1,138 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+#
+# Extension optionnelle du semi-Viterbi. Pour la compiler :
+#     cythonize -i hmmadn/_viterbi_c.pyx
+# Si elle n'est pas compilée, SemiViterbi utilise Numba ou NumPy.
+
+from cython cimport floating
+
+import numpy as np
+
+
+def run_semi_viterbi(
+        const int[::1] pred_ptr,
+        const int[::1] pred_idx,
+        const floating[::1] pred_log_a,
+        const floating[:, :, ::1] log_b_seg,
+        const floating[::1] log_mus,
+        const floating[::1] log_pd,
+    ):
+    """Calculer la séquence optimale des états et des durées du semi-Viterbi.
+
+    La récursion est la même que celle de _kernels.semi_viterbi_core, mais
+    les phis sont rangés dans un seul int32 par cellule : l'état dans les
+    16 bits de poids fort et la durée dans les 16 bits de poids faible,
+    -1 indiquant l'absence de prédécesseur. Les tables sont en float32 ou
+    en float64, selon le type des entrées.
+
+    Paramètres
+    ----------
+    pred_ptr, pred_idx, pred_log_a : memoryview
+        Les prédécesseurs de chaque état, sans l'état lui-même, voir
+        utils.get_predecessors.
+    log_b_seg : memoryview
+        Les log-vraisemblances des segments, de forme (N, T, D_max).
+    log_mus : memoryview
+        Le log des probabilités initiales, de forme (N,).
+    log_pd : memoryview
+        Le log des probabilités des durées 1..D_max.
+
+    Sortie
+    ------
+    tuple[list[int], list[int], ndarray, ndarray]
+        La liste des états et la liste des durées de la séquence optimale,
+        puis la table des deltas, de forme (T, D_max, N), et celle des phis
+        empaquetés, de forme (T, D_max, N).
+
+    Raises
+    ------
+    IndexError
+        Si la séquence d'observations est vide.
+    ValueError
+        Si N ou D_max vaut 0, ou ne tient pas sur 16 bits.
+
+    """
+    cdef Py_ssize_t n = log_b_seg.shape[0]
+    cdef Py_ssize_t n_obs = log_b_seg.shape[1]
+    cdef Py_ssize_t max_d = log_b_seg.shape[2]
+    if n_obs == 0:
+        raise IndexError("la séquence d'observations est vide")
+    if n == 0 or max_d == 0 or n >= 1 << 15 or max_d >= 1 << 16:
+        raise ValueError
+
+    dtype = np.float32 if floating is float else np.float64
+    deltas_arr = np.full((n_obs, max_d, n), -np.inf, dtype=dtype)
+    phis_arr = np.full((n_obs, max_d, n), -1, dtype=np.int32)
+    best_prev_arr = np.empty((n_obs, n), dtype=dtype)
+    best_d_arr = np.empty((n_obs, n), dtype=np.int32)
+    cdef floating[:, :, ::1] deltas = deltas_arr
+    cdef int[:, :, ::1] phis = phis_arr
+    cdef floating[:, ::1] best_prev = best_prev_arr
+    cdef int[:, ::1] best_d = best_d_arr
+
+    cdef Py_ssize_t t, d, d_, i, j, k, d_lim
+    cdef floating neg_inf = -np.inf
+    cdef floating log_pd_d, log_bs, max_val, temp
+    cdef int phi
+
+    with nogil:
+        for t in range(n_obs):
+            d_lim = t + 1 if t + 1 < max_d else max_d
+            for d in range(1, d_lim + 1):
+                log_pd_d = log_pd[d-1]
+                if log_pd_d == neg_inf:
+                    continue
+                for j in range(n):
+                    log_bs = log_b_seg[j, t, d-1]
+                    if log_bs == neg_inf:
+                        continue
+                    if d == t + 1:
+                        # Le premier segment de la séquence.
+                        deltas[t, d-1, j] = log_mus[j] + log_pd_d + log_bs
+                        continue
+                    max_val = neg_inf
+                    phi = -1
+                    for k in range(pred_ptr[j], pred_ptr[j+1]):
+                        i = pred_idx[k]
+                        temp = (
+                            pred_log_a[k] + log_pd_d + best_prev[t-d, i]
+                            + log_bs
+                        )
+                        if temp > max_val:
+                            max_val = temp
+                            phi = (<int>i << 16) | best_d[t-d, i]
+                    deltas[t, d-1, j] = max_val
+                    phis[t, d-1, j] = phi
+            for i in range(n):
+                best_prev[t, i] = deltas[t, 0, i]
+                best_d[t, i] = 1
+                for d_ in range(1, max_d):
+                    if deltas[t, d_, i] > best_prev[t, i]:
+                        best_prev[t, i] = deltas[t, d_, i]
+                        best_d[t, i] = <int>d_ + 1
+
+    # Le premier maximum de deltas[T-1], dans l'ordre (d, j).
+    cdef Py_ssize_t d_star = 1, j_star = 0
+    max_val = deltas[n_obs-1, 0, 0]
+    for d in range(max_d):
+        for j in range(n):
+            if deltas[n_obs-1, d, j] > max_val:
+                max_val = deltas[n_obs-1, d, j]
+                d_star = d + 1
+                j_star = j
+
+    states = [j_star]
+    durations = [d_star]
+    t = n_obs
+    while t > 0:
+        phi = phis[t-1, d_star-1, j_star]
+        t -= d_star
+        if phi < 0:
+            if t != 0:
+                raise Exception
+            continue
+        j_star = phi >> 16
+        d_star = phi & 0xFFFF
+        states.append(j_star)
+        durations.append(d_star)
+    return states[::-1], durations[::-1], deltas_arr, phis_arr
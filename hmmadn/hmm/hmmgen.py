@@ -1,7 +1,9 @@
 from __future__ import annotations
 
-from numpy import ndarray, repeat
+from numpy import cumsum, ndarray, repeat, searchsorted
+from numpy.random import Generator, PCG64
 
+from hmmadn._kernels import markov_walk
 from hmmadn._typing import TYPE_CHECKING
 from hmmadn.utils import ObservationLaw, ProbVec
 
@@ -20,12 +22,15 @@ class HMMGen:
         La longeur de la liste des états.
     trans_matrix : ndarray
         ...
-    trans_vectors : dict[any, ProbVec]
-        ...
+    _cum_rows : ndarray
+        Les lignes cumulatives de trans_matrix, d'où toutes les
+        transitions sont tirées avec _gen.
     obs_laws : ObservationLaw
         ...
     state : any
-        ...
+        L'état actuel, calculé à partir de _state_idx.
+    _state_idx : int
+        La position de l'état actuel dans la liste des états.
 
     Méthodes
     --------
@@ -61,8 +66,8 @@ class HMMGen:
         """
         self.states = states
         self.n = len(states)
+        self._gen = Generator(PCG64())
         self._set_trans_matrix(trans_matrix)
-        self._set_trans_vectors()
         self._set_obs_laws(obs_laws)
         self._set_mus(mus)
 
@@ -93,20 +98,9 @@ class HMMGen:
             if sum(trans_matrix[i]) != 1.:
                 raise ValueError
         self.trans_matrix = trans_matrix
-
-    def _set_trans_vectors(self) -> None:
-        """Déclarer la variable de classe de trans_vectors.
-
-        En effet, pour bien utiliser le trans_matrix pour
-        tirer des états, il faut qu'on utilise une structure
-        de ProbVec. Ainsi, pour chaque état actuel, on peut
-        générer le prochain selon les probabilités.
-
-        """
-        self.trans_vectors = {
-            self.states[i]: ProbVec(self.trans_matrix[i], self.states)
-            for i in range(self.n)
-        }
+        self._cum_rows = cumsum(trans_matrix, axis=1, dtype=float)
+        # Éviter qu'une erreur d'arrondi laisse un tirage hors de la ligne.
+        self._cum_rows[:, -1] = 1.
 
     def _set_obs_laws(self, obs_laws: ObservationLaw) -> None:
         """Valider et déclarer la variable d'obs_laws.
@@ -150,7 +144,7 @@ class HMMGen:
             if len(mus) != self.n:
                 raise ValueError
             self.mus = ProbVec(mus, self.states)
-        self.state = self.mus.gen_value()
+        self._state_idx = self.mus.gen_index()
 
     def gen_obs(self, m: int, states: bool = False) -> List[Observation | tuple]:
         """Générer une séquence des observations selon le modéle.
@@ -175,19 +169,31 @@ class HMMGen:
             la sortie est multi-dimensionnelle)
 
         """
+        # Tous les tirages des transitions sont faits en un seul appel, puis
+        # la chaîne est parcourue sur les indices des états.
+        idxs = markov_walk(self._cum_rows, self._state_idx, self._gen.random(m))
         res = []
         states_res = []
-        for _ in range(m):
-            curr_obs = self.obs_laws(self.state)
+        for idx in idxs[:-1]:
+            state = self.states[idx]
+            res.append(self.obs_laws(state))
             if states:
-                states_res.append(self.state)
-            res.append(curr_obs)
-            self.next_state()
+                states_res.append(state)
+        self._state_idx = int(idxs[-1])
         if states:
             return res, states_res
         return res
 
     def next_state(self) -> None:
         """Déclarer le prochain état selon l'état actuel."""
-        self.state = self.trans_vectors[self.state].gen_value()
+        self._state_idx = int(searchsorted(
+            self._cum_rows[self._state_idx], self._gen.random(), side='right'
+        ))
+
+    @property
+    def state(self) -> State:
+        return self.states[self._state_idx]
 
+    @state.setter
+    def state(self, state: State) -> None:
+        self._state_idx = self.states.index(state)
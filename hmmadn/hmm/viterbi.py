@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-from math import log
+from numpy import arange, array, empty, float64, int32
 
+from hmmadn._kernels import NUMBA_AVAILABLE, viterbi_core
 from hmmadn._typing import TYPE_CHECKING
+from hmmadn.utils import get_predecessors, masked_log
 
 if TYPE_CHECKING:
     from hmmadn._typing import Callable, List, Observation, State, ndarray
@@ -10,86 +12,87 @@ if TYPE_CHECKING:
 
 class Viterbi:
 
+    # Le type de données des tables de la récursion. float32 divise la
+    # mémoire par deux, mais les deltas cumulés atteignent vite -1e4, où
+    # l'arrondi du float32 (~1e-3) suffit à rendre un chemin non optimal
+    # sur des séquences longues : float64 est donc le défaut.
+    dtype: type = float64
+
     def __init__(
             self,
             states: List[State],
             obs_list: List[Observation],
             trans_mat: ndarray[float],
             mus: ndarray[float],
-            b_Sj_Ot_function: Callable
+            b_Sj_Ot_function: Callable,
+            dtype: type | None = None,
         ) -> None:
+        if dtype is not None:
+            self.dtype = dtype
         self.states = states
         self.n = len(states)
-        self.deltas = []
-        self.phis = []
         self.obs_list = obs_list
         self.n_obs = len(obs_list)
         self.trans_mat = trans_mat
+        # Le log de 0 vaut -inf, ce qui évite de traiter des erreurs
+        # dans la récursion.
+        self.log_trans = masked_log(trans_mat, self.dtype)
+        self._pred_ptr, self._pred_idx, self._pred_log_a = get_predecessors(
+            trans_mat, dtype=self.dtype
+        )
         self.mus = mus
+        self.log_mus = masked_log([mus[j] for j in range(self.n)], self.dtype)
         self.b_Sj_Ot_function = b_Sj_Ot_function
 
-    def run_viterbi(self) -> None:
+    def run_viterbi(self) -> List[int]:
+        self.precompute_logB()
+        return self.decode()
+
+    def decode(self) -> List[int]:
+        """Lancer la récursion et le retour en arrière sur logB déjà calculé."""
+        if self.n_obs == 0:
+            raise IndexError("la séquence d'observations est vide")
+        # Les tables sont allouées une seule fois, en mémoire contiguë.
+        self.deltas = empty((self.n_obs, self.n), dtype=self.dtype)
+        self.phis = empty((self.n_obs, self.n), dtype=int32)
         self._get_deltas_and_phis()
-        phi_T = self.deltas[-1].index(max(self.deltas[-1]))
-        states_star = [phi_T]
-        for phis in list(reversed(self.phis[1:])):
-            states_star.append(
-                phis[states_star[-1]]
-            )
+        state = int(self.deltas[-1].argmax())
+        states_star = [state]
+        for t in range(self.n_obs - 1, 0, -1):
+            state = int(self.phis[t][state])
+            states_star.append(state)
         return list(reversed(states_star))
 
-    def _get_deltas_and_phis(self):
-        for t in range(self.n_obs):
-            if t == 0:
-                self.deltas.append([
-                    log(self.mus[j]) + log(self._b_Sj_Ot(j, t))
-                    for j in range(self.n)
-                ])
-                self.phis.append(
-                    [0 for _ in range(self.n)]
-                )
-            else:
-                self.deltas.append(
-                    [self._get_dtj(t, j) for j in range(self.n)]
-                )
-                self.phis.append(
-                    [self._get_phi_tj(t, j) for j in range(self.n)]
-                )
+    def precompute_logB(self) -> None:
+        """Calculer une seule fois la matrice logB[t, j] = log(b_j(O_t))."""
+        # La forme est imposée pour qu'une séquence vide donne (0, N).
+        self.logB = masked_log(array([
+            [self._b_Sj_Ot(j, t) for j in range(self.n)]
+            for t in range(self.n_obs)
+        ], dtype=float64).reshape(self.n_obs, self.n), self.dtype)
+
+    def _get_deltas_and_phis(self) -> None:
+        if NUMBA_AVAILABLE:
+            viterbi_core(
+                self._pred_ptr,
+                self._pred_idx,
+                self._pred_log_a,
+                self.logB,
+                self.log_mus,
+                self.deltas,
+                self.phis,
+            )
+            return
+
+        cols = arange(self.n)
+        self.phis[0] = 0
+        self.deltas[0] = self.log_mus + self.logB[0]
+        for t in range(1, self.n_obs):
+            # m[i, j] = log(a_ij) + delta_{t-1}(i)
+            m = self.log_trans + self.deltas[t-1][:, None]
+            self.phis[t] = m.argmax(axis=0)
+            self.deltas[t] = m[self.phis[t], cols] + self.logB[t]
 
     def _b_Sj_Ot(self, j: int, t: int) -> float:
         return self.b_Sj_Ot_function(j, self.obs_list[t])
-    
-    def _get_dtj(self, t: int, j: int) -> float:
-        max_ = -float('inf')
-        bsjot = self._b_Sj_Ot(j, t)
-        for i in range(self.n):
-            try:
-                temp = (
-                    log(self.trans_mat[i][j])
-                    + self.deltas[t-1][i]
-                    + log(bsjot)
-                )
-            except ValueError:
-                # Si la probabilité est 0, le log
-                # donnera une erreur
-                temp = -float('inf')
-            if temp > max_:
-                max_ = temp
-        return max_
-
-    def _get_phi_tj(self, t: int, j: int) -> float:
-        max_value = -float('inf')
-        max_S = None
-        for i in range(self.n):
-            try:
-                temp = (
-                    log(self.trans_mat[i][j])
-                    + self.deltas[t-1][i]
-                )
-            except ValueError:
-                temp = -float('inf')
-            if temp > max_value:
-                max_value = temp
-                max_S = i
-        return max_S
 
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
-from numpy import repeat
+from numpy import array, concatenate, cumsum, empty, repeat
+from numpy.random import Generator, PCG64
 
+from hmmadn._kernels import markov_walk
 from hmmadn._typing import TYPE_CHECKING
-from hmmadn.utils import ProbVec
+from hmmadn.utils import DurationLaw, ObservationLaw, ProbVec
 
 if TYPE_CHECKING:
     from hmmadn._typing import Callable, List, Observation, State, Tuple, ndarray
@@ -21,16 +23,21 @@ class SemiGen:
         ) -> None:
         self.states = states
         self.n = len(states)
-        self._set_trans_vectors(semi_trans_mat)
+        self._gen = Generator(PCG64())
+        self._set_trans_mat(semi_trans_mat)
         self._set_duration_law(duration_law)
         self._set_mus(mus)
         self.obs_law = obs_law
 
-    def _set_trans_vectors(self, semi_trans_mat: ndarray) -> None:
-        self.trans_vectors = {
-            self.states[i]: ProbVec(semi_trans_mat[i], self.states)
-            for i in range(self.n)
-        }
+    def _set_trans_mat(self, semi_trans_mat: ndarray) -> None:
+        for i in range(self.n):
+            if len(semi_trans_mat[i]) != self.n:
+                raise ValueError
+            if semi_trans_mat[i].sum() != 1:
+                raise ValueError
+        self._cum_rows = cumsum(semi_trans_mat, axis=1, dtype=float)
+        # Éviter qu'une erreur d'arrondi laisse un tirage hors de la ligne.
+        self._cum_rows[:, -1] = 1.
 
     def _set_duration_law(self, duration_law: Callable) -> None:
         self._duration_law = duration_law
@@ -43,45 +50,68 @@ class SemiGen:
             if len(mus) != self.n:
                 raise ValueError
             self.mus = ProbVec(mus, self.states)
-        self.state = self.mus.gen_value()
+        self._state_idx = self.mus.gen_index()
+
+    @property
+    def state(self) -> State:
+        return self.states[self._state_idx]
 
-    def _next_state(self) -> float:
-        self.state = self.trans_vectors[self.state].gen_value()
+    @state.setter
+    def state(self, state: State) -> None:
+        self._state_idx = self.states.index(state)
     
     def get_duration(self):
         return self._duration_law()
+
+    def get_durations(self, m: int) -> List[int]:
+        # Une loi de DurationLaw peut tirer toutes les durées en un seul
+        # appel ; sinon, on l'appelle une fois par état.
+        if isinstance(self._duration_law, DurationLaw):
+            return self._duration_law.gen_values(m).tolist()
+        return [self.get_duration() for _ in range(m)]
     
+    def gen_obs_batch(self, state: State, k: int) -> ndarray:
+        if isinstance(self.obs_law, ObservationLaw):
+            return self.obs_law.gen_obs_batch(state, k)
+        return array([self.obs_law(state) for _ in range(k)])
+
     def gen_semi_hmm(self, num_states: int) -> dict:
+        durations = self.get_durations(num_states)
+        # Toutes les transitions sont tirées en un seul appel au générateur.
+        idxs = markov_walk(
+            self._cum_rows, self._state_idx, self._gen.random(num_states)
+        )
+        self._state_idx = int(idxs[-1])
+        states_only = [self.states[idx] for idx in idxs[:-1]]
+
+        # Les segments sont tous tirés d'abord, puis écrits dans un seul
+        # array dont le type est commun à tous, pour qu'aucune observation
+        # ne soit tronquée. Chaque segment en est ensuite une vue.
+        segments = [
+            self.gen_obs_batch(state, duration)
+            for state, duration in zip(states_only, durations)
+        ]
+        non_empty = [segment for segment in segments if len(segment) > 0]
+        obs_only = concatenate(non_empty) if non_empty else empty(0)
+        n_obs = sum(durations)
         segmented_obs = []
-        states_only = []
-        states_only2 = []
-        duration_only = []
-        obs_only = []
-        states_and_durations = []
-
-        for _ in range(num_states):
-            duration = self.get_duration()
-            obs_sequence = []
-            for _ in range(duration):
-                curr_obs = self.obs_law(self.state)
-                obs_sequence.append(curr_obs)
-                obs_only.append(curr_obs)
-                states_only2.append(self.state)
-
-            states_only.append(self.state)
-            states_and_durations.append((self.state, duration))
-            segmented_obs.append(obs_sequence)
-            duration_only.append(duration)
-            self._next_state()
+        start = 0
+        for duration in durations:
+            segmented_obs.append(obs_only[start:start+duration])
+            start += duration
 
         return SemiGenRes(**{
             "segmented_obs": segmented_obs,
             "states_only": states_only,
-            "states_only2": states_only2,
-            "duration_only": duration_only,
+            "states_only2": [
+                state
+                for state, duration in zip(states_only, durations)
+                for _ in range(duration)
+            ],
+            "duration_only": durations,
             "obs_only": obs_only,
-            "states_and_durations": states_and_durations,
-            "n_obs": len(obs_only),
+            "states_and_durations": list(zip(states_only, durations)),
+            "n_obs": n_obs,
         })
 
 
@@ -93,7 +123,7 @@ class SemiGenRes:
             states_only: List[State],
             states_only2: List[State],
             duration_only: List[int],
-            obs_only: List[Observation],
+            obs_only: ndarray[Observation],
             states_and_durations: List[Tuple[int, State]],
             n_obs: int,
         ) -> None:
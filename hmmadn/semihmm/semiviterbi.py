@@ -1,17 +1,30 @@
 from __future__ import annotations
 
-from numpy import array, isnan, log, unravel_index
+from numpy import (
+    arange, empty, float64, full, inf, int32, isfinite, take_along_axis,
+    unravel_index, where, zeros,
+)
 
+from hmmadn._kernels import NUMBA_AVAILABLE, semi_viterbi_core
 from hmmadn._typing import TYPE_CHECKING
-from hmmadn.utils import sum_delta_arrays
+from hmmadn.utils import get_predecessors, masked_log, sum_delta_arrays
 from .semigen import SemiGenRes
 
+try:
+    from hmmadn._viterbi_c import run_semi_viterbi
+except ImportError:
+    # L'extension en Cython est optionnelle, voir _viterbi_c.pyx.
+    run_semi_viterbi = None
+
 if TYPE_CHECKING:
-    from hmmadn._typing import Callable, List, ndarray
+    from hmmadn._typing import Callable, List, Tuple, ndarray
 
 
 class SemiViterbi:
 
+    # Le type de données des tables de la récursion, voir Viterbi.dtype.
+    dtype: type = float64
+
     def __init__(
             self,
             n_states: int,
@@ -21,70 +34,150 @@ class SemiViterbi:
             pd: Callable,
             b_Sj_Ot_function: Callable,
             trans_mat: ndarray[float],
+            dtype: type | None = None,
         ) -> None:
+        if dtype is not None:
+            self.dtype = dtype
         self.n_obs = gen_res.n_obs
         self.obs_list = gen_res.obs_only
         self.mus = mus
+        self.log_mus = masked_log(
+            [mus[j] for j in range(n_states)], self.dtype
+        )
         self.pd = pd
         self.n = n_states
         self._max_d = d_max
+        # Les probabilités des durées ne changent pas : leur log est
+        # calculé une seule fois pour d = 1..D_max.
+        self._log_pd = masked_log(
+            [pd(d) for d in range(1, d_max+1)], self.dtype
+        )
         self.num_obs_states = len(gen_res.segmented_obs)
         self.b_Sj_Ot_function = b_Sj_Ot_function
         self.trans_mat = trans_mat
+        self.log_trans = masked_log(trans_mat, self.dtype)
+        # Une transition vers le même état n'est pas permise.
+        self.log_trans[arange(self.n), arange(self.n)] = -inf
+        self._pred_ptr, self._pred_idx, self._pred_log_a = get_predecessors(
+            trans_mat, self_transitions=False, dtype=self.dtype
+        )
+
+    def run_viterbi(self) -> Tuple[List[int], List[int]]:
+        self.precompute_logB()
+        return self.decode()
+
+    def decode(self) -> Tuple[List[int], List[int]]:
+        """Lancer la récursion et le retour en arrière sur logB_seg déjà
+        calculé, et sortir les listes des états et des durées.
+
+        """
+        if run_semi_viterbi is not None:
+            # L'extension compilée fait la récursion et le retour en arrière.
+            # Ses phis sont empaquetés en un int32, (i << 16) | d : ils sont
+            # dépaquetés pour garder la même table que les autres chemins.
+            (
+                self.states_only, self.durations_only, self.deltas, packed,
+            ) = run_semi_viterbi(
+                self._pred_ptr,
+                self._pred_idx,
+                self._pred_log_a,
+                self.logB_seg,
+                self.log_mus,
+                self._log_pd,
+            )
+            self.phis = full(
+                (self.n_obs, self._max_d, self.n, 2), -1, dtype=int32
+            )
+            reachable = packed >= 0
+            self.phis[..., 0][reachable] = packed[reachable] >> 16
+            self.phis[..., 1][reachable] = packed[reachable] & 0xFFFF
+            self.states_and_durations = list(
+                zip(self.states_only, self.durations_only)
+            )
+            return self.states_only, self.durations_only
 
-    def run_viterbi(self) -> None:
+        # Les tables sont allouées une seule fois, en mémoire contiguë.
+        self.deltas = full(
+            (self.n_obs, self._max_d, self.n), -inf, dtype=self.dtype
+        )
+        self.phis = full((self.n_obs, self._max_d, self.n, 2), -1, dtype=int32)
         self.set_deltas_and_phis()
         self.set_optimal_sequence()
+        return self.states_only, self.durations_only
+
+    def precompute_logB(self) -> None:
+        """Calculer une seule fois le tenseur logB_seg[j, t, d-1].
 
-    def set_deltas_and_phis(self) -> list:
-        self.deltas = []
-        self.phis = []
+        L'élément donne le log de la vraisemblance du segment
+        d'observations de longeur d qui se termine à t, dans l'état j.
+        Les combinaisons où le segment dépasse le début de la séquence
+        valent -inf.
+
+        """
+        # Les vraisemblances nulles, y compris celles des segments invalides
+        # laissés à 0, deviennent -inf avec un seul log sur tout le tenseur.
+        b_seg = zeros((self.n, self.n_obs, self._max_d))
         for t in range(self.n_obs):
-            if t == 0:
-                self.deltas.append(
-                    self.get_init_delta_array(t, t+1)
-                )
-                self.phis.append(
-                    array([
-                        [(float('nan'), float('nan')) for _ in range(self.n)]
-                        for _ in range(1, self._max_d+1)
-                    ])
-                )
-            else:
-                self.deltas.append(self.get_delta(t))
-                self.phis.append(
-                    array([
-                        [self._get_phi_tj(t, j, d) for j in range(self.n)]
-                        for d in range(1, self._max_d+1) 
-                    ])  
-                )
+            for d in range(1, min(t+1, self._max_d)+1):
+                obs_segment = self.obs_list[(t+1-d):t+1]
+                for j in range(self.n):
+                    b_seg[j, t, d-1] = self._b_Sj_Ot(j, obs_segment)
+        self.logB_seg = masked_log(b_seg, self.dtype)
+
+    def set_deltas_and_phis(self) -> None:
+        if NUMBA_AVAILABLE:
+            semi_viterbi_core(
+                self._pred_ptr,
+                self._pred_idx,
+                self._pred_log_a,
+                self.logB_seg,
+                self.log_mus,
+                self._log_pd,
+                self.deltas,
+                self.phis,
+            )
+            return
+
+        # _best_prev[t, i] = max sur d_ de deltas[t][d_][i], et _best_d[t, i]
+        # la durée d_+1 qui l'atteint : la réduction sur d_ ne dépend pas de
+        # (d, j), elle est donc faite une seule fois par t.
+        self._best_prev = empty((self.n_obs, self.n), dtype=self.dtype)
+        self._best_d = empty((self.n_obs, self.n), dtype=int32)
+        self.deltas[0] = self.get_init_delta_array(0, 1)
+        self._set_best_prev(0)
+        for t in range(1, self.n_obs):
+            self.deltas[t], self.phis[t] = self.get_delta_and_phi(t)
+            self._set_best_prev(t)
 
     def get_init_delta_array(self, t: int, init_d: int) -> ndarray:
-        return array([
-            [
-                log(self.mus[j])
-                + log(self.pd(d))
-                + log(self._b_Sj_Ot(j, self.obs_list[(t+1-d):t+1]))
-                if d == init_d else -float('inf')
-                for j in range(self.n)
-            ]
-            for d in range(1, self._max_d+1)
-        ])
-
-    def get_delta(self, t: int):
-        delta_array = self.get_delta_array(t)
+        delta_array = full((self._max_d, self.n), -inf, dtype=self.dtype)
+        delta_array[init_d-1] = (
+            self.log_mus
+            + self._log_pd[init_d-1]
+            + self.logB_seg[:, t, init_d-1]
+        )
+        return delta_array
+
+    def get_delta_and_phi(self, t: int) -> Tuple[ndarray, ndarray]:
+        n_d, m = self._get_transition_scores(t)
+        # i_star[d-1, j] : le premier i qui maximise m[d-1, i, j].
+        i_star = m.argmax(axis=1)
+
+        delta_array = full((self._max_d, self.n), -inf, dtype=self.dtype)
+        delta_array[:n_d] = take_along_axis(m, i_star[:, None, :], axis=1)[:, 0]
+
+        phi_array = full((self._max_d, self.n, 2), -1, dtype=int32)
+        reachable = isfinite(delta_array[:n_d])
+        d_star = take_along_axis(self._best_d[t-1::-1][:n_d], i_star, axis=1)
+        phi_array[:n_d, :, 0] = where(reachable, i_star, -1)
+        phi_array[:n_d, :, 1] = where(reachable, d_star, -1)
+
         if t < self._max_d:
-            return sum_delta_arrays(
+            delta_array = sum_delta_arrays(
                 self.get_init_delta_array(t, t+1),
                 delta_array
             )
-        return delta_array
-
-    def get_delta_array(self, t: int) -> ndarray:
-        return array([
-            [self._get_dtj(t, j, d) for j in range(self.n)]
-            for d in range(1, self._max_d+1)
-        ])
+        return delta_array, phi_array
 
     def set_optimal_sequence(self) -> None:
         self.states_only = []
@@ -105,7 +198,7 @@ class SemiViterbi:
         while t > 0:
             j_star, d_star = self.phis[t-1][d-1][j]
             t -= d
-            if isnan(j_star) or isnan(d_star):
+            if j_star < 0 or d_star < 0:
                 if t != 0:
                     raise Exception
                 else:
@@ -122,60 +215,20 @@ class SemiViterbi:
 
     def _b_Sj_Ot(self, j: int, obs_segment: List[ndarray]) -> float:
         return self.b_Sj_Ot_function(j, obs_segment)
-        
-    def _get_dtj(self, t: int, j: int, d: int) -> float:
-        # d needs to be 1-indexed
-        obs_segment = self.obs_list[(t+1-d):t+1]
-        bsjot = self._b_Sj_Ot(j, obs_segment)
-        max_ = -float('inf')
-        for i in range(self.n):
-            if i != j:
-                for d_ in range(self._max_d):
-                    pd = self.pd(d)
-                    if (
-                        self.trans_mat[i][j] == 0
-                        or t < d
-                        or bsjot == 0
-                        or pd == 0
-                    ):
-                        temp = -float('inf')
-                    else:
-                        temp = (
-                            log(self.trans_mat[i][j])
-                            + log(pd)
-                            + self.deltas[t-d][d_][i]
-                            + log(bsjot)
-                        )
-                    if temp > max_:
-                        max_ = temp
-        return max_
-    
-    def _get_phi_tj(self, t: int, j: int, d: int) -> float:
-        # d needs to be 1-indexed
-        obs_segment = self.obs_list[(t+1-d):t+1]
-        bsjot = self._b_Sj_Ot(j, obs_segment)
-        max_ = -float('inf')
-        state_duration_pair = (float('nan'), float('nan'))
-        
-        for i in range(self.n):
-            if i != j:
-                for d_ in range(self._max_d):
-                    pd = self.pd(d)
-                    if (
-                        self.trans_mat[i][j] == 0
-                        or t < d
-                        or bsjot == 0
-                        or pd == 0.0
-                    ):
-                        temp = -float('inf')
-                    else:
-                        temp = (
-                            log(self.trans_mat[i][j])
-                            + log(pd)
-                            + self.deltas[t-d][d_][i]
-                            + log(bsjot)
-                        )
-                    if temp > max_:
-                        max_ = temp
-                        state_duration_pair = (i, d_+1)
-        return state_duration_pair
\ No newline at end of file
+
+    def _set_best_prev(self, t: int) -> None:
+        self._best_prev[t] = self.deltas[t].max(axis=0)
+        self._best_d[t] = self.deltas[t].argmax(axis=0) + 1
+
+    def _get_transition_scores(self, t: int) -> Tuple[int, ndarray]:
+        # Les durées d = 1..n_d pour lesquelles un segment précédent existe.
+        n_d = min(t, self._max_d)
+        # prev[d-1, i] = max sur d_ de deltas[t-d][d_][i]
+        prev = self._best_prev[t-1::-1][:n_d]
+        # m[d-1, i, j] = log(a_ij) + log(pd(d)) + prev[d-1, i]
+        #                + log(b_j(O_{t+1-d:t+1}))
+        return n_d, (
+            (self.log_trans + self._log_pd[:n_d, None, None])
+            + prev[:, :, None]
+            + self.logB_seg[:, t, :n_d].T[:, None, :]
+        )
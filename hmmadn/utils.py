@@ -1,22 +1,82 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from os import cpu_count, environ
 
-from numpy import append, array, cumsum, where, ndarray
+from numpy import (
+    append, array, asarray, cumsum, errstate, fill_diagonal, float64, fromiter,
+    int32, isneginf, log, nonzero, searchsorted, subtract, where, ndarray,
+)
 from numpy.random import Generator, PCG64
 
 from hmmadn._typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from hmmadn._typing import List, Observation, State
+    from hmmadn._typing import Any, List, Observation, State, Tuple
+
+
+def masked_log(x: ndarray, dtype: type = float64) -> ndarray:
+    """Calculer le log d'un array des probabilités, avec log(0) = -inf.
+
+    Le log est toujours calculé en float64, puis converti en dtype.
+
+    """
+    with errstate(divide='ignore'):
+        return log(asarray(x, dtype=float64)).astype(dtype, copy=False)
+
+
+def get_predecessors(
+        trans_mat: ndarray,
+        self_transitions: bool = True,
+        dtype: type = float64,
+    ) -> Tuple[ndarray, ndarray, ndarray]:
+    """Lister, pour chaque état j, les états i tels que a_ij > 0.
+
+    Le résultat est en format colonne compressé : les prédécesseurs de j
+    sont indices[indptr[j]:indptr[j+1]], en ordre croissant, et log_a
+    donne le log(a_ij) correspondant.
+
+    Paramètres
+    ----------
+    trans_mat : ndarray
+        La matrice de transition, de forme (N, N).
+    self_transitions : bool, optionel, défaut = True
+        Si False, l'état j n'est jamais son propre prédécesseur.
+    dtype : type, optionel, défaut = float64
+        Le type de données de log_a.
+
+    Sortie
+    ------
+    tuple[ndarray, ndarray, ndarray]
+        Les arrays d'indptr, d'indices et de log_a.
+
+    """
+    trans_mat = asarray(trans_mat, dtype=float64)
+    mask = trans_mat > 0
+    if not self_transitions:
+        fill_diagonal(mask, False)
+    indptr = append(0, cumsum(mask.sum(axis=0))).astype(int32)
+    cols, indices = nonzero(mask.T)
+    log_a = log(trans_mat[indices, cols]).astype(dtype)
+    return indptr, indices.astype(int32), log_a
 
 
 def sum_delta_arrays(delta1: ndarray, delta2: ndarray) -> ndarray:
-    delta1[delta1 == -float('inf')] = 0
-    delta2[delta2 == -float('inf')] = 0
-    res = delta1 + delta2
-    res[res == 0] = -float('inf')
-    return res
+    """Combiner deux arrays des deltas, où -inf marque une valeur absente.
+
+    Là où un seul des deux arrays vaut -inf, l'autre valeur est gardée ;
+    là où les deux sont finis, ils sont additionnés. Les arrays d'entrée
+    ne sont pas modifiés.
+
+    """
+    neg_inf1 = isneginf(delta1)
+    neg_inf2 = isneginf(delta2)
+    return where(
+        neg_inf1,
+        delta2,
+        where(neg_inf2, delta1, delta1 + delta2),
+    )
 
 
 class ProbVec:
@@ -37,6 +97,10 @@ class ProbVec:
     --------
     gen_value : any
         Tirer une valeur du value_vec selon les probabilités en prob_vec.
+    gen_values : ndarray
+        Tirer plusieurs valeurs du value_vec en un seul appel.
+    gen_index : int
+        Tirer la position d'une valeur, sans passer par value_vec.
 
     """
 
@@ -67,15 +131,23 @@ class ProbVec:
             raise ValueError
         self.prob_vec = prob_vec
         self.cum_prob_vec = append(0., cumsum(prob_vec))
+        # Éviter qu'une erreur d'arrondi laisse un tirage hors du vecteur.
+        self.cum_prob_vec[-1] = 1.
+        # La vue sans le zéro initial sert à la recherche dichotomique.
+        self._cum = self.cum_prob_vec[1:]
         self.value_vec = value_vec
+        # Un array d'objets à une dimension : les états peuvent être de
+        # n'importe quel type, y compris des tuples de longeurs différentes.
+        self._values_arr = fromiter(value_vec, dtype=object, count=self.n)
         self._gen = Generator(PCG64())
 
     def gen_value(self) -> State:
         """Tirer une valeur du value_vec selon les probabilités en prob_vec.
 
         Pour tirer une valeur, un nombre aléatoire est généré entre 0 et 1,
-        puis on trouve la position en prob_vec qui inclut ce nomnre. La
-        position trouvée est utilisé pour sortir la valeur finale.
+        puis on trouve par recherche dichotomique la position en prob_vec
+        qui inclut ce nombre. La position trouvée est utilisé pour sortir
+        la valeur finale.
 
         Sortie
         -------
@@ -83,11 +155,37 @@ class ProbVec:
             La valeur tirée.
 
         """
-        rand = self._gen.uniform()
-        for i in range(self.n):
-            if self.cum_prob_vec[i] < rand <= self.cum_prob_vec[i+1]:
-                return self.value_vec[i]
-            
+        return self.value_vec[self.gen_index()]
+
+    def gen_index(self) -> int:
+        """Tirer la position d'une valeur selon les probabilités en prob_vec.
+
+        Sortie
+        -------
+        int
+            La position tirée dans value_vec.
+
+        """
+        return int(searchsorted(self._cum, self._gen.random(), side='right'))
+
+    def gen_values(self, m: int) -> ndarray:
+        """Tirer m valeurs du value_vec en un seul appel au générateur.
+
+        Paramètres
+        ----------
+        m : int
+            Le nombre de valeurs à tirer.
+
+        Sortie
+        -------
+        ndarray
+            Les valeurs tirées.
+
+        """
+        return self._values_arr[
+            searchsorted(self._cum, self._gen.random(m), side='right')
+        ]
+
     def __call__(self) -> State:
         return self.gen_value()
             
@@ -107,13 +205,20 @@ class ObservationLaw(ABC):
     gen_obs(state)
         Méthode abstraite pour générer une observation basée un état
         actuel.
+    gen_obs_batch(state, k)
+        Générer k observations pour le même état. Par défaut, gen_obs
+        est appelée k fois ; une sous-classe peut la redéfinir pour tirer
+        toutes les observations en un seul appel.
 
     """
 
     @abstractmethod
     def gen_obs(self, state: State) -> Observation:
         raise NotImplementedError
-    
+
+    def gen_obs_batch(self, state: State, k: int) -> ndarray:
+        return array([self.gen_obs(state) for _ in range(k)])
+
     def __call__(self, state: State) -> Observation:
         return self.gen_obs(state)
 
@@ -122,18 +227,62 @@ def get_error(
         viterbi_states: List[State],
         n: int,
     ) -> float:
-    return (abs(array(viterbi_states) - array(obs_states)).sum()) / n
+    # asarray ne copie pas les entrées qui sont déjà des ndarray.
+    return float(
+        abs(subtract(asarray(viterbi_states), asarray(obs_states))).sum()
+    ) / n
 
 def get_duration_error(
         obs_durations: List[int],
         viterbi_durations: List[int],
     ) -> float:
-    h = where(
-        (array(obs_durations) - array(viterbi_durations)) != 0,
-        1,
-        0
-    )
-    return h.sum() / h.size
+    obs_durations = asarray(obs_durations)
+    return float(
+        (obs_durations != asarray(viterbi_durations)).sum()
+    ) / obs_durations.size
+
+
+def decode_batch(decoders: List[Any], n_jobs: int | None = None) -> List[Any]:
+    """Décoder plusieurs séquences avec des décodeurs indépendants.
+
+    Chaque objet de Viterbi ou de SemiViterbi décode sa propre séquence,
+    donc les décodages peuvent être faits en parallèle. Les tables de
+    logB sont calculées d'abord, en série : elles appellent les fonctions
+    de vraisemblance en Python, qui gardent le GIL. Seules les récursions
+    (run_viterbi sans precompute_logB, voir decode) sont lancées dans des
+    threads. Les noyaux compilés (Numba ou Cython) libèrent le GIL, mais
+    pas l'implémentation en NumPy ni le retour en arrière : le gain des
+    threads est donc limité à la part de la récursion compilée.
+
+    Paramètres
+    ----------
+    decoders : list
+        Les objets de Viterbi ou de SemiViterbi à lancer.
+    n_jobs : int | None, optionel, défaut = None
+        Le nombre de threads. -1 utilise tous les processeurs. Si None,
+        la variable d'environnement HMMADN_N_JOBS est lue, et par défaut
+        les décodages sont faits en série.
+
+    Sortie
+    -------
+    list
+        Les sorties de run_viterbi, dans l'ordre des décodeurs : la liste
+        des états pour Viterbi, le tuple des listes des états et des
+        durées pour SemiViterbi.
+
+    """
+    if n_jobs is None:
+        n_jobs = int(environ.get("HMMADN_N_JOBS", 1))
+    if n_jobs == -1:
+        n_jobs = cpu_count() or 1
+    if n_jobs < 1:
+        raise ValueError
+    for decoder in decoders:
+        decoder.precompute_logB()
+    if n_jobs == 1:
+        return [decoder.decode() for decoder in decoders]
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        return list(executor.map(lambda decoder: decoder.decode(), decoders))
 
 
 class DurationLaw(ABC):
@@ -141,6 +290,9 @@ class DurationLaw(ABC):
     @abstractmethod
     def gen_value(self) -> State:
         raise NotImplementedError
+
+    def gen_values(self, m: int) -> ndarray:
+        return array([self.gen_value() for _ in range(m)])
     
     @abstractmethod
     def get_prob(self, state: State) -> float:
@@ -0,0 +1,23 @@
+import numpy as np
+
+from hmmadn import HMMGen
+from hmmadn.utils import ObservationLaw
+
+
+class StateLaw(ObservationLaw):
+
+    def gen_obs(self, state):
+        return state
+
+
+def test_next_state_follows_trans_matrix():
+    # Un cycle déterministe 0 -> 1 -> 2 -> 0.
+    trans = np.array([[0., 1., 0.], [0., 0., 1.], [1., 0., 0.]])
+    gen = HMMGen([0, 1, 2], trans, StateLaw())
+    gen.state = 0
+    visited = []
+    for _ in range(6):
+        gen.next_state()
+        visited.append(gen.state)
+    assert visited == [1, 2, 0, 1, 2, 0]
+    assert gen.gen_obs(4) == [0, 1, 2, 0]
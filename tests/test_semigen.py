@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from hmmadn import SemiGen
+
+CYCLE = np.array([[0., 1.], [1., 0.]])
+
+
+def test_rejects_rows_not_summing_to_one():
+    with pytest.raises(ValueError):
+        SemiGen([0, 1], np.array([[0., .5], [1., 0.]]), lambda s: s, lambda: 1)
+
+
+def test_states_follow_semi_trans_mat():
+    gen = SemiGen([0, 1], CYCLE, lambda s: s, lambda: 2)
+    gen.state = 1
+    res = gen.gen_semi_hmm(4)
+    assert res.states_only == [1, 0, 1, 0]
+    # L'état courant est déjà celui qui suit le dernier segment.
+    assert gen.state == 1
+
+
+def test_obs_only_keeps_later_float_observations():
+    # Le premier segment est en int, les suivants en float.
+    gen = SemiGen(
+        [0, 1], CYCLE, lambda s: 0 if s == 0 else 0.75, lambda: 2,
+    )
+    gen.state = 0
+    res = gen.gen_semi_hmm(4)
+    np.testing.assert_array_equal(
+        res.obs_only, [0, 0, .75, .75, 0, 0, .75, .75]
+    )
+    for segment, state in zip(res.segmented_obs, res.states_only):
+        assert np.shares_memory(segment, res.obs_only)
+        np.testing.assert_array_equal(segment, [.75 * state] * 2)
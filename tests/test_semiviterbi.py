@@ -0,0 +1,165 @@
+from itertools import product
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import hmmadn.semihmm.semiviterbi as semiviterbi
+from hmmadn import SemiViterbi
+from hmmadn.utils import decode_batch
+
+
+def make_decoder(seed, n_obs=60, dtype=np.float64):
+    rng = np.random.default_rng(seed)
+    n, k, d_max = int(rng.integers(2, 5)), 3, int(rng.integers(1, 6))
+    trans = rng.random((n, n))
+    np.fill_diagonal(trans, 0)
+    trans[np.arange(n), (np.arange(n) + 1) % n] += .1
+    trans /= trans.sum(axis=1, keepdims=True)
+    b = rng.random((n, k)) + .05
+    b /= b.sum(axis=1, keepdims=True)
+    pd = rng.random(d_max) + .05
+    pd /= pd.sum()
+    mus = rng.random(n)
+    mus /= mus.sum()
+    obs = rng.integers(0, k, n_obs)
+    gen_res = SimpleNamespace(
+        n_obs=n_obs, obs_only=obs, segmented_obs=[obs],
+    )
+    return SemiViterbi(
+        n, d_max, gen_res, list(mus),
+        lambda d: pd[d-1],
+        lambda j, segment: np.prod(b[j][segment]),
+        trans,
+        dtype=dtype,
+    )
+
+
+def decode(decoder):
+    decoder.run_viterbi()
+    return decoder.states_only, decoder.durations_only
+
+
+def use_backend(backend, monkeypatch):
+    # "compiled" : l'extension en Cython, "kernel" : le noyau de _kernels
+    # (compilé par Numba s'il est installé), "numpy" : le code vectorisé.
+    if backend == "compiled":
+        pytest.importorskip("hmmadn._viterbi_c")
+        return
+    monkeypatch.setattr(semiviterbi, "run_semi_viterbi", None)
+    monkeypatch.setattr(semiviterbi, "NUMBA_AVAILABLE", backend == "kernel")
+
+
+def brute_force(decoder):
+    """Chercher le meilleur log-score parmi toutes les segmentations."""
+    obs, n, d_max = decoder.obs_list, decoder.n, decoder._max_d
+    best = -np.inf
+
+    def extend(t, prev, score):
+        nonlocal best
+        if t == decoder.n_obs:
+            best = max(best, score)
+            return
+        for d, j in product(range(1, d_max + 1), range(n)):
+            if t + d > decoder.n_obs or j == prev:
+                continue
+            if prev is None:
+                start = decoder.mus[j]
+            else:
+                start = decoder.trans_mat[prev][j]
+            prob = start * decoder.pd(d) * decoder.b_Sj_Ot_function(
+                j, obs[t:t+d]
+            )
+            if prob > 0:
+                extend(t + d, j, score + np.log(prob))
+
+    extend(0, None, 0.)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_extension_matches_fallback(seed, monkeypatch):
+    pytest.importorskip("hmmadn._viterbi_c")
+    compiled = make_decoder(seed)
+    decode(compiled)
+    monkeypatch.setattr(semiviterbi, "run_semi_viterbi", None)
+    fallback = make_decoder(seed)
+    decode(fallback)
+
+    assert compiled.states_only == fallback.states_only
+    assert compiled.durations_only == fallback.durations_only
+    np.testing.assert_array_equal(compiled.deltas, fallback.deltas)
+    np.testing.assert_array_equal(compiled.phis, fallback.phis)
+
+
+@pytest.mark.parametrize("compiled", [True, False])
+def test_empty_sequence_raises(compiled, monkeypatch):
+    if compiled:
+        pytest.importorskip("hmmadn._viterbi_c")
+    else:
+        monkeypatch.setattr(semiviterbi, "run_semi_viterbi", None)
+    with pytest.raises(IndexError):
+        decode(make_decoder(0, n_obs=0))
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_decode_batch_returns_states_and_durations(n_jobs):
+    expected = [make_decoder(seed).run_viterbi() for seed in range(4)]
+    decoders = [make_decoder(seed) for seed in range(4)]
+    assert decode_batch(decoders, n_jobs=n_jobs) == expected
+
+
+def segments_log_prob(decoder, states, durations):
+    # Les tables de log du décodeur en float64 donnent le score du chemin.
+    score = decoder.log_mus[states[0]]
+    t = -1
+    for k, (j, d) in enumerate(zip(states, durations)):
+        t += d
+        score += decoder._log_pd[d-1] + decoder.logB_seg[j, t, d-1]
+        if k > 0:
+            score += decoder.log_trans[states[k-1], j]
+    return score
+
+
+def test_default_dtype_is_float64():
+    assert SemiViterbi.dtype is np.float64
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_float32_against_float64(seed):
+    exact = make_decoder(seed, n_obs=1000)
+    best = segments_log_prob(exact, *decode(exact))
+    approx = make_decoder(seed, n_obs=1000, dtype=np.float32)
+    score = segments_log_prob(exact, *decode(approx))
+
+    # Voir tests/test_viterbi.py : l'écart du float32 reste petit en relatif.
+    assert best >= score
+    assert (best - score) / abs(best) < 1e-5
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("seed", range(10))
+def test_numpy_matches_kernel(seed, dtype, monkeypatch):
+    use_backend("kernel", monkeypatch)
+    kernel = make_decoder(seed, dtype=dtype)
+    decode(kernel)
+    use_backend("numpy", monkeypatch)
+    vectorized = make_decoder(seed, dtype=dtype)
+    decode(vectorized)
+
+    assert kernel.states_only == vectorized.states_only
+    assert kernel.durations_only == vectorized.durations_only
+    np.testing.assert_array_equal(kernel.deltas, vectorized.deltas)
+    np.testing.assert_array_equal(kernel.phis, vectorized.phis)
+
+
+@pytest.mark.parametrize("backend", ["compiled", "kernel", "numpy"])
+@pytest.mark.parametrize("seed", range(5))
+def test_path_is_optimal(seed, backend, monkeypatch):
+    use_backend(backend, monkeypatch)
+    decoder = make_decoder(seed, n_obs=7)
+    states, durations = decode(decoder)
+    assert sum(durations) == decoder.n_obs
+    assert segments_log_prob(decoder, states, durations) == pytest.approx(
+        brute_force(decoder)
+    )
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from hmmadn.utils import ProbVec, sum_delta_arrays
+
+
+@pytest.mark.parametrize("values", [
+    [(0,), (1, 2)],
+    [("a", 1), ("b", 2)],
+])
+def test_prob_vec_keeps_tuple_states(values):
+    prob_vec = ProbVec(np.array([.5, .5]), values)
+    drawn = prob_vec.gen_values(20)
+    assert drawn.shape == (20,)
+    assert all(value in values for value in drawn)
+    assert prob_vec.gen_value() in values
+
+
+def test_prob_vec_draws_follow_probabilities():
+    prob_vec = ProbVec(np.array([0., .25, .75]), ["x", "y", "z"])
+    drawn = prob_vec.gen_values(4000).tolist()
+    assert "x" not in drawn
+    assert drawn.count("z") / len(drawn) == pytest.approx(.75, abs=.05)
+    assert prob_vec.cum_prob_vec[-1] == 1.
+
+
+def test_sum_delta_arrays():
+    delta1 = np.array([-np.inf, 0., -1., -np.inf])
+    delta2 = np.array([-2., -np.inf, -3., -np.inf])
+    copies = delta1.copy(), delta2.copy()
+
+    result = sum_delta_arrays(delta1, delta2)
+
+    # -inf marque une valeur absente, et un delta nul est une valeur.
+    np.testing.assert_array_equal(result, [-2., 0., -4., -np.inf])
+    np.testing.assert_array_equal(delta1, copies[0])
+    np.testing.assert_array_equal(delta2, copies[1])
@@ -0,0 +1,106 @@
+from itertools import product
+
+import numpy as np
+import pytest
+
+import hmmadn.hmm.viterbi as viterbi
+from hmmadn import Viterbi
+
+
+def make_model(seed, n=4, k=3):
+    rng = np.random.default_rng(seed)
+    trans = rng.random((n, n)) + .05
+    trans /= trans.sum(axis=1, keepdims=True)
+    b = rng.random((n, k)) + .05
+    b /= b.sum(axis=1, keepdims=True)
+    return trans, b, np.ones(n) / n
+
+
+def path_log_prob(path, trans, b, mus, obs):
+    path = np.asarray(path)
+    return (
+        np.log(mus[path[0]])
+        + np.log(trans[path[:-1], path[1:]]).sum()
+        + np.log(b[path, obs]).sum()
+    )
+
+
+def test_default_dtype_is_float64():
+    assert Viterbi.dtype is np.float64
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_float32_against_float64(seed):
+    trans, b, mus = make_model(seed)
+    obs = np.random.default_rng(seed).integers(0, b.shape[1], 2000)
+    scores = {}
+    for dtype in (np.float32, np.float64):
+        decoder = Viterbi(
+            list(range(len(mus))), obs, trans, mus,
+            lambda j, o: b[j][o], dtype=dtype,
+        )
+        scores[dtype] = path_log_prob(
+            decoder.run_viterbi(), trans, b, mus, obs
+        )
+
+    # Le chemin en float64 est optimal ; celui en float32 peut s'en écarter
+    # par l'arrondi des deltas cumulés, mais de peu en relatif.
+    assert scores[np.float64] >= scores[np.float32]
+    gap = (scores[np.float64] - scores[np.float32]) / abs(scores[np.float64])
+    assert gap < 1e-5
+
+
+@pytest.mark.parametrize("numba", [True, False])
+def test_empty_sequence_raises(numba, monkeypatch):
+    if not numba:
+        monkeypatch.setattr(viterbi, "NUMBA_AVAILABLE", False)
+    trans, b, mus = make_model(0)
+    decoder = Viterbi(
+        list(range(len(mus))), [], trans, mus, lambda j, o: b[j][o],
+    )
+    with pytest.raises(IndexError):
+        decoder.run_viterbi()
+
+
+def make_decoder(seed, n_obs, dtype=np.float64):
+    trans, b, mus = make_model(seed)
+    rng = np.random.default_rng(seed)
+    # Quelques transitions nulles, pour parcourir les prédécesseurs creux.
+    trans[rng.random(trans.shape) < .3] = 0
+    trans[:, 0] += .05
+    trans /= trans.sum(axis=1, keepdims=True)
+    obs = rng.integers(0, b.shape[1], n_obs)
+    decoder = Viterbi(
+        list(range(len(mus))), obs, trans, mus,
+        lambda j, o: b[j][o], dtype=dtype,
+    )
+    return decoder, (trans, b, mus, obs)
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("seed", range(10))
+def test_numpy_matches_kernel(seed, dtype, monkeypatch):
+    monkeypatch.setattr(viterbi, "NUMBA_AVAILABLE", True)
+    kernel, _ = make_decoder(seed, 200, dtype)
+    kernel_path = kernel.run_viterbi()
+    monkeypatch.setattr(viterbi, "NUMBA_AVAILABLE", False)
+    vectorized, _ = make_decoder(seed, 200, dtype)
+
+    assert vectorized.run_viterbi() == kernel_path
+    np.testing.assert_array_equal(kernel.deltas, vectorized.deltas)
+    np.testing.assert_array_equal(kernel.phis, vectorized.phis)
+
+
+@pytest.mark.parametrize("numba", [True, False])
+@pytest.mark.parametrize("seed", range(5))
+def test_path_is_optimal(seed, numba, monkeypatch):
+    monkeypatch.setattr(viterbi, "NUMBA_AVAILABLE", numba)
+    decoder, model = make_decoder(seed, 6)
+    with np.errstate(divide="ignore"):
+        best = max(
+            path_log_prob(path, *model)
+            for path in product(range(decoder.n), repeat=decoder.n_obs)
+        )
+    score = path_log_prob(decoder.run_viterbi(), *model)
+    assert np.isfinite(best)
+    assert score == pytest.approx(best)